@@ -1,29 +1,62 @@
 """
 Agent proxy module for handling Cortex Agent API requests.
 """
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException, Depends
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from typing import Any, Dict, Optional, AsyncGenerator
+from typing import Any, Callable, Dict, Optional, AsyncGenerator, AsyncIterator
+import anyio
 import httpx
 import json
+import msgspec
+import orjson
 from .config import settings
-from .auth import get_current_user
-from .snowflake_client import create_http_client
+from .auth import require_session_user
+from .snowflake_client import get_http_client
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/agent", tags=["agent"])
 
+# Settings used on the streaming path, fixed for the life of the process
+_REMOVE_SQL = settings.REMOVE_SQL_FROM_RESPONSE
+_ENDPOINT = settings.SNOWFLAKE_AGENT_API_ENDPOINT
 
-class AgentRequest(BaseModel):
+# Largest chunk of filtered events held back before sending to the client
+_FLUSH_SIZE = 16384
+
+# Chunks read ahead from the Cortex API while the client catches up
+_STREAM_BUFFER_SIZE = 32
+
+
+class AgentRequest(msgspec.Struct, omit_defaults=True):
     """Request body for agent interactions"""
+    messages: list
     thread_id: Optional[int] = None
     parent_message_id: Optional[int] = None
-    messages: list
     tool_choice: Optional[Dict[str, Any]] = None
 
 
+async def parse_agent_request(request: Request) -> AgentRequest:
+    """
+    Decode and validate the agent request body.
+    
+    Args:
+        request: The incoming HTTP request
+        
+    Returns:
+        The validated agent request
+        
+    Raises:
+        HTTPException: If the body is not a valid agent request
+    """
+    try:
+        return msgspec.json.decode(await request.body(), type=AgentRequest)
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
 def prepare_agent_request(request_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Prepare the request to send to the Cortex Agent API.
@@ -40,6 +73,26 @@ def prepare_agent_request(request_data: Dict[str, Any]) -> Dict[str, Any]:
     return request_data
 
 
+def encode_agent_request(agent_request: AgentRequest) -> bytes:
+    """
+    Build the request body to send to the Cortex Agent API.
+    
+    Args:
+        agent_request: The validated agent request
+        
+    Returns:
+        JSON request body
+    """
+    prepared_request = prepare_agent_request(msgspec.to_builtins(agent_request))
+    logger.debug(f"Prepared request: {prepared_request}")
+    return msgspec.json.encode(prepared_request)
+
+
+# Quoted key looked for in raw event bytes before paying for a JSON parse;
+# quoting it avoids false hits on "sql" appearing inside string values
+_SQL_KEY = b'"sql"'
+
+
 def should_filter_field(field_name: str) -> bool:
     """
     Determine if a field should be filtered from the response.
@@ -55,119 +108,291 @@ def should_filter_field(field_name: str) -> bool:
     return False
 
 
-def filter_event_data(event_data: Dict[str, Any]) -> Dict[str, Any]:
+def _make_sql_stripper() -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Build an event filter that removes 'sql' fields at any depth.
+    
+    Returns:
+        Filter function that modifies the event data in place
+    """
+    field_name = "sql"
+    
+    def strip_sql(event_data: Dict[str, Any]) -> Dict[str, Any]:
+        # Walk nested dicts/lists iteratively, removing 'sql' fields
+        stack = [event_data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                node.pop(field_name, None)
+                stack.extend(v for v in node.values() if isinstance(v, (dict, list)))
+            elif isinstance(node, list):
+                stack.extend(v for v in node if isinstance(v, (dict, list)))
+        return event_data
+    
+    return strip_sql
+
+
+def _no_filter(event_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Event filter used when filtering is disabled; returns the data unchanged."""
+    return event_data
+
+
+# Filter fields from event data based on configuration. The filter is chosen
+# once at import; when enabled it modifies the freshly parsed event in place.
+# The stream only calls it with filtering enabled, but it stays a no-op
+# otherwise for custom code that calls it directly.
+filter_event_data: Callable[[Dict[str, Any]], Dict[str, Any]] = (
+    _make_sql_stripper() if _REMOVE_SQL else _no_filter
+)
+
+
+def format_sse_line(line: bytes) -> bytes:
     """
-    Filter fields from event data based on configuration.
+    Format a single non-empty SSE line from the Cortex Agent API for the client.
+    
+    Only used when SQL filtering is enabled; otherwise the stream is passed
+    through without being parsed.
     
     Args:
-        event_data: The event data dictionary
+        line: The raw line bytes, without the trailing newline
         
     Returns:
-        Filtered event data
+        The newline-terminated line to send to the client, or empty bytes
+        if the line could not be filtered
     """
-    if not settings.REMOVE_SQL_FROM_RESPONSE:
-        return event_data
+    # Parse SSE format: "event: <type>\ndata: <json>\n\n"
+    if line.startswith(b"event:"):
+        return b"event: " + line[6:].strip() + b"\n"
+    if line.startswith(b"data:"):
+        if _SQL_KEY not in line:
+            # Nothing to filter, forward the line untouched
+            return line + b"\n"
+        data_bytes = line[5:].strip()
+        try:
+            # Parse and filter the data
+            data = orjson.loads(data_bytes)
+            filtered_data = filter_event_data(data)
+            return b"data: " + orjson.dumps(filtered_data) + b"\n"
+        except orjson.JSONDecodeError:
+            pass
+        try:
+            # orjson is stricter than the stdlib (NaN, lone surrogates from
+            # split emoji), so retry before deciding the line is not JSON
+            data = json.loads(data_bytes)
+            filtered_data = filter_event_data(data)
+            return b"data: " + json.dumps(filtered_data).encode() + b"\n"
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            # Unparseable line that may contain SQL: drop it rather than
+            # forward it unfiltered
+            logger.warning("Dropping unparseable event data containing a sql field")
+            return b""
+    return line + b"\n"
+
+
+def format_error_event(error: Exception) -> bytes:
+    """
+    Format an SSE error event to send to the client.
     
-    # Recursively remove 'sql' fields
-    filtered = {}
-    for key, value in event_data.items():
-        if key == "sql":
-            continue
-        elif isinstance(value, dict):
-            filtered[key] = filter_event_data(value)
-        elif isinstance(value, list):
-            filtered[key] = [
-                filter_event_data(item) if isinstance(item, dict) else item
-                for item in value
-            ]
-        else:
-            filtered[key] = value
+    Args:
+        error: The error that ended the stream
+        
+    Returns:
+        The complete error event
+    """
+    return b'event: error\ndata: {"error":' + orjson.dumps(str(error)) + b'}\n\n'
+
+
+@asynccontextmanager
+async def open_agent_stream(
+    request_body: bytes
+) -> AsyncIterator[httpx.Response]:
+    """
+    Open a streaming request to the Cortex Agent API.
     
-    return filtered
+    Args:
+        request_body: The JSON request body to send to the API
+        
+    Yields:
+        The streaming response, after checking its status
+        
+    Raises:
+        HTTPException: If the Cortex API returns an error status
+    """
+    client = get_http_client()
+    async with client.stream(
+        "POST",
+        _ENDPOINT,
+        content=request_body
+    ) as response:
+        if response.status_code != 200:
+            error_text = await response.aread()
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Cortex API error: {error_text.decode()}"
+            )
+        yield response
 
 
 async def stream_agent_response(
-    request_data: Dict[str, Any]
-) -> AsyncGenerator[str, None]:
+    request_body: bytes
+) -> AsyncGenerator[bytes, None]:
     """
-    Stream responses from the Cortex Agent API.
+    Stream responses from the Cortex Agent API, filtering each event.
     
     Args:
-        request_data: The request data to send to the API
+        request_body: The JSON request body to send to the API
         
     Yields:
-        Server-sent event formatted strings
+        Server-sent event formatted chunks
     """
     logger.info(f"Starting agent request stream")
-    # Prepare the request (allow customization)
-    prepared_request = prepare_agent_request(request_data)
-    logger.debug(f"Prepared request: {prepared_request}")
+    try:
+        async with open_agent_stream(request_body) as response:
+            # Split the byte stream into lines ourselves rather than
+            # decoding every chunk to text with aiter_lines(). Complete
+            # events parsed from one upstream read are sent to the client
+            # together, so each read costs at most one send()
+            buf = bytearray()
+            out = bytearray()
+            event_lines = []
+            async for chunk in response.aiter_bytes():
+                buf.extend(chunk)
+                while (nl := buf.find(b"\n")) != -1:
+                    line = bytes(buf[:nl]).rstrip(b"\r")
+                    del buf[:nl + 1]
+                    if line.strip():
+                        event_lines.append(format_sse_line(line))
+                    elif event_lines:
+                        # Empty line terminates the event
+                        out += b"".join(event_lines)
+                        out += b"\n"
+                        event_lines.clear()
+                        if len(out) >= _FLUSH_SIZE:
+                            yield bytes(out)
+                            out.clear()
+                if out:
+                    yield bytes(out)
+                    out.clear()
+            if buf.strip():
+                event_lines.append(format_sse_line(bytes(buf).rstrip(b"\r")))
+            if event_lines:
+                yield b"".join(event_lines) + b"\n"
+                    
+    except httpx.RequestError as e:
+        yield format_error_event(e)
+
+
+async def passthrough_agent_response(
+    request_body: bytes
+) -> AsyncGenerator[bytes, None]:
+    """
+    Stream responses from the Cortex Agent API to the client unmodified.
+    
+    Used when no filtering is configured, so the SSE stream does not need
+    to be parsed at all.
+    
+    Args:
+        request_body: The JSON request body to send to the API
+        
+    Yields:
+        Chunks of the upstream server-sent event stream
+    """
+    logger.info("Starting agent request stream")
+    at_event_boundary = True
+    try:
+        async with open_agent_stream(request_body) as response:
+            async for chunk in response.aiter_bytes():
+                at_event_boundary = chunk.endswith(b"\n\n")
+                yield chunk
+    except httpx.RequestError as e:
+        if not at_event_boundary:
+            # Terminate the partial upstream event so the error event is
+            # parsed on its own
+            yield b"\n\n" + format_error_event(e)
+        else:
+            yield format_error_event(e)
+
+
+async def buffer_stream(
+    source: AsyncGenerator[bytes, None]
+) -> AsyncGenerator[bytes, None]:
+    """
+    Read a stream ahead into a bounded buffer in a separate task.
+    
+    The upstream Cortex connection is drained into the buffer as fast as
+    it produces data, so a slow client only blocks it once the buffer is
+    full instead of on every chunk.
+    
+    Args:
+        source: The stream to read from
+        
+    Yields:
+        Chunks of the source stream
+    """
+    send_stream, receive_stream = anyio.create_memory_object_stream(_STREAM_BUFFER_SIZE)
     
-    async with create_http_client() as client:
+    async def pump() -> None:
         try:
-            async with client.stream(
-                "POST",
-                settings.SNOWFLAKE_AGENT_API_ENDPOINT,
-                json=prepared_request
-            ) as response:
-                if response.status_code != 200:
-                    error_text = await response.aread()
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"Cortex API error: {error_text.decode()}"
-                    )
-                
-                # Stream the response line by line
-                async for line in response.aiter_lines():
-                    if line.strip():
-                        # Parse SSE format: "event: <type>\ndata: <json>\n\n"
-                        if line.startswith("event:"):
-                            event_type = line[6:].strip()
-                            yield f"event: {event_type}\n"
-                        elif line.startswith("data:"):
-                            data_str = line[5:].strip()
-                            try:
-                                # Parse and optionally filter the data
-                                data = json.loads(data_str)
-                                filtered_data = filter_event_data(data)
-                                yield f"data: {json.dumps(filtered_data)}\n"
-                            except json.JSONDecodeError:
-                                # If not JSON, pass through as-is
-                                yield f"data: {data_str}\n"
-                        else:
-                            yield f"{line}\n"
-                    else:
-                        # Empty line separates events
-                        yield "\n"
-                        
-        except httpx.RequestError as e:
-            error_event = {
-                "event": "error",
-                "data": json.dumps({"error": str(e)})
-            }
-            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
-
-
-@router.post("/run")
-async def run_agent(
-    request: AgentRequest,
-    username: str = Depends(get_current_user)
-):
+            async with send_stream:
+                async for chunk in source:
+                    await send_stream.send(chunk)
+        except anyio.BrokenResourceError:
+            # The client went away
+            pass
+        finally:
+            await source.aclose()
+    
+    # A plain task rather than a task group, since the generator may be
+    # finalized from a different task than the one iterating it
+    pump_task = asyncio.create_task(pump())
+    try:
+        async with receive_stream:
+            async for chunk in receive_stream:
+                yield chunk
+        # Surface any error raised while reading the source
+        await pump_task
+    finally:
+        pump_task.cancel()
+
+
+# The body is decoded by parse_agent_request, so describe it for OpenAPI
+_, _agent_schemas = msgspec.json.schema_components([AgentRequest])
+
+
+@router.post(
+    "/run",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": _agent_schemas["AgentRequest"]}}
+        }
+    }
+)
+async def run_agent(raw: Request):
     """
     Proxy endpoint for Cortex Agent API requests.
     
+    The session cookie and body are read directly from the request rather
+    than through FastAPI dependencies.
+    
     Args:
-        request: The agent request from the frontend
-        username: Authenticated user from session
+        raw: The incoming HTTP request with the agent request body
         
     Returns:
         Streaming response with agent events
     """
+    username = require_session_user(raw.cookies.get(settings.SESSION_COOKIE_NAME))
     logger.info(f"Agent request from user: {username}")
-    request_dict = request.model_dump(exclude_none=True)
+    request = await parse_agent_request(raw)
+    request_body = encode_agent_request(request)
+    
+    if _REMOVE_SQL:
+        stream = stream_agent_response(request_body)
+    else:
+        stream = passthrough_agent_response(request_body)
     
     return StreamingResponse(
-        stream_agent_response(request_dict),
+        buffer_stream(stream),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -2,9 +2,12 @@
 Authentication module for user login, logout, and session management.
 """
 import logging
-from fastapi import APIRouter, HTTPException, Response, Cookie, Depends
+import threading
+import time
+from fastapi import APIRouter, HTTPException, Request, Response, Cookie, Depends
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, Optional, Tuple
+import msgspec
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 from .config import settings
 from .snowflake_client import authenticate_user
@@ -14,9 +17,17 @@ router = APIRouter(prefix="/api/auth", tags=["authentication"])
 
 # Session serializer for signed cookies
 serializer = URLSafeTimedSerializer(settings.SESSION_SECRET_KEY)
+_MAX_AGE = settings.SESSION_MAX_AGE
 
+# Already-verified session cookies mapped to (username, expiry timestamp),
+# so active sessions skip signature verification on every request. The lock
+# guards it since get_current_user runs in FastAPI's threadpool.
+_SESSION_CACHE_SIZE = 4096
+_session_cache: Dict[str, Tuple[str, float]] = {}
+_session_cache_lock = threading.Lock()
 
-class LoginRequest(BaseModel):
+
+class LoginRequest(msgspec.Struct):
     """Login request body"""
     username: str
     password: str
@@ -29,6 +40,25 @@ class LoginResponse(BaseModel):
     message: Optional[str] = None
 
 
+async def parse_login_request(request: Request) -> LoginRequest:
+    """
+    Dependency to decode and validate the login request body.
+    
+    Args:
+        request: The incoming HTTP request
+        
+    Returns:
+        The validated login request
+        
+    Raises:
+        HTTPException: If the body is not a valid login request
+    """
+    try:
+        return msgspec.json.decode(await request.body(), type=LoginRequest)
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
 def create_session_cookie(username: str) -> str:
     """
     Create a signed session cookie value.
@@ -52,18 +82,39 @@ def verify_session_cookie(cookie_value: str) -> Optional[str]:
     Returns:
         Username if valid, None otherwise
     """
+    with _session_cache_lock:
+        cached = _session_cache.get(cookie_value)
+        if cached is not None:
+            username, expires_at = cached
+            if time.time() < expires_at:
+                return username
+            del _session_cache[cookie_value]
+    
     try:
-        data = serializer.loads(cookie_value, max_age=settings.SESSION_MAX_AGE)
-        return data.get("username")
+        data, signed_at = serializer.loads(
+            cookie_value,
+            max_age=_MAX_AGE,
+            return_timestamp=True
+        )
     except (BadSignature, SignatureExpired):
         return None
+    
+    username = data.get("username")
+    if username:
+        with _session_cache_lock:
+            if len(_session_cache) >= _SESSION_CACHE_SIZE:
+                # Evict the oldest entry
+                del _session_cache[next(iter(_session_cache))]
+            _session_cache[cookie_value] = (
+                username,
+                signed_at.timestamp() + _MAX_AGE
+            )
+    return username
 
 
-def get_current_user(
-    session: Optional[str] = Cookie(None, alias=settings.SESSION_COOKIE_NAME)
-) -> str:
+def require_session_user(session: Optional[str]) -> str:
     """
-    Dependency to get the current authenticated user from session cookie.
+    Get the authenticated user from a session cookie value.
     
     Args:
         session: Session cookie value
@@ -84,8 +135,42 @@ def get_current_user(
     return username
 
 
-@router.post("/login", response_model=LoginResponse)
-async def login(request: LoginRequest, response: Response):
+def get_current_user(
+    session: Optional[str] = Cookie(None, alias=settings.SESSION_COOKIE_NAME)
+) -> str:
+    """
+    Dependency to get the current authenticated user from session cookie.
+    
+    Args:
+        session: Session cookie value
+        
+    Returns:
+        Username of authenticated user
+        
+    Raises:
+        HTTPException: If not authenticated
+    """
+    return require_session_user(session)
+
+
+# The body is decoded by parse_login_request, so describe it for OpenAPI
+_, _login_schemas = msgspec.json.schema_components([LoginRequest])
+
+
+@router.post(
+    "/login",
+    response_model=LoginResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": _login_schemas["LoginRequest"]}}
+        }
+    }
+)
+async def login(
+    response: Response,
+    request: LoginRequest = Depends(parse_login_request)
+):
     """
     Authenticate a user and create a session.
     
@@ -105,7 +190,7 @@ async def login(request: LoginRequest, response: Response):
         response.set_cookie(
             key=settings.SESSION_COOKIE_NAME,
             value=cookie_value,
-            max_age=settings.SESSION_MAX_AGE,
+            max_age=_MAX_AGE,
             httponly=True,
             samesite="lax"
         )
@@ -2,11 +2,13 @@
 Main FastAPI application module.
 """
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
 from .auth import router as auth_router
 from .agent import router as agent_router
+from .snowflake_client import close_http_clients
 
 # Configure logging
 logging.basicConfig(
@@ -19,11 +21,20 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifespan: release shared HTTP clients on shutdown"""
+    yield
+    await close_http_clients()
+
+
 # Create FastAPI application
 app = FastAPI(
     title="Cortex Agent API",
     description="Backend proxy for Snowflake Cortex Agent interactions",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
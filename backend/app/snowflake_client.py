@@ -21,32 +21,35 @@ async def authenticate_user(username: str, password: str) -> Optional[Dict[str,
     Returns:
         User dictionary if authentication successful, None otherwise
     """
-    logger.info(f"Authenticating user {username} with password {password}")
+    logger.info(f"Authenticating user {username}")
     try:
-        query = f"SELECT userid FROM {settings.SNOWFLAKE_DATABASE}.{settings.SNOWFLAKE_SCHEMA}.users WHERE userid = '{username}' AND password = '{password}'"
+        # Credentials are sent as bind variables, never interpolated into the SQL
+        query = f"SELECT userid FROM {settings.SNOWFLAKE_DATABASE}.{settings.SNOWFLAKE_SCHEMA}.users WHERE userid = ? AND password = ?"
         
         payload = {
             "statement": query,
+            "bindings": {
+                "1": {"type": "TEXT", "value": username},
+                "2": {"type": "TEXT", "value": password},
+            },
             "warehouse": settings.SNOWFLAKE_WAREHOUSE,
         }
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            sf_response = await client.post(
-                f"{settings.SNOWFLAKE_SQL_API_ENDPOINT}",
-                headers=get_snowflake_api_headers(),
-                json=payload
-            )
-            
-            result = sf_response.json()
-            
-            # Check if user was found
-            if result.get("data") and len(result["data"]) == 1:
-                return {"username": username}
+        sf_response = await get_sql_client().post(
+            f"{settings.SNOWFLAKE_SQL_API_ENDPOINT}",
+            json=payload
+        )
+        
+        result = sf_response.json()
+        
+        # Check if user was found
+        if result.get("data") and len(result["data"]) == 1:
+            return {"username": username}
         
         return None
         
     except Exception as e:
-        print(f"Authentication error: {e}")
+        logger.error(f"Authentication error: {e}")
         return None
 
 
@@ -74,15 +77,66 @@ def get_cortex_api_headers() -> Dict[str, str]:
     return headers
 
 
-def create_http_client() -> httpx.AsyncClient:
+# Shared clients so connections (and TLS sessions) to Snowflake are reused
+# across requests instead of being re-established on every call. They are
+# created on first use, and again after close_http_clients() has run.
+_agent_client: Optional[httpx.AsyncClient] = None
+_sql_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
     """
-    Create an async HTTP client configured for Cortex API requests.
+    Get the shared async HTTP client configured for Cortex API requests.
+    
+    The client must not be closed by callers; it is closed on application
+    shutdown via close_http_clients().
     
     Returns:
-        Configured httpx.AsyncClient instance
+        Shared httpx.AsyncClient instance
     """
-    return httpx.AsyncClient(
-        headers=get_cortex_api_headers(),
-        timeout=300.0  # 5 minute timeout for long-running agent queries
-    )
+    global _agent_client
+    if _agent_client is None or _agent_client.is_closed:
+        _agent_client = httpx.AsyncClient(
+            headers=get_cortex_api_headers(),
+            timeout=httpx.Timeout(300.0, connect=10.0),  # 5 minute timeout for long-running agent queries
+            # Many concurrent user streams go to the same host; HTTP/2 multiplexes
+            # them over a few connections, kept alive between agent runs
+            limits=httpx.Limits(
+                max_keepalive_connections=50,
+                max_connections=200,
+                keepalive_expiry=300
+            ),
+            http2=True
+        )
+    return _agent_client
+
 
+def get_sql_client() -> httpx.AsyncClient:
+    """
+    Get the shared async HTTP client configured for SQL API requests.
+    
+    The client must not be closed by callers; it is closed on application
+    shutdown via close_http_clients().
+    
+    Returns:
+        Shared httpx.AsyncClient instance
+    """
+    global _sql_client
+    if _sql_client is None or _sql_client.is_closed:
+        _sql_client = httpx.AsyncClient(
+            headers=get_snowflake_api_headers(),
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            http2=True
+        )
+    return _sql_client
+
+
+async def close_http_clients() -> None:
+    """
+    Close the shared HTTP clients and release their pooled connections.
+    """
+    if _agent_client is not None:
+        await _agent_client.aclose()
+    if _sql_client is not None:
+        await _sql_client.aclose()